@@ -7,42 +7,54 @@
 # - Generates a clean PDF (0.5" left/right margins)
 # -----------------------------------------------
 
+import asyncio
+import copy
+import functools
+import hashlib
+import io
+import json
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
 from textwrap import dedent
+from types import SimpleNamespace
 
+import orjson                        # ✅ REQUIRED
 import streamlit as st               # ✅ REQUIRED
+import zstandard as zstd             # ✅ REQUIRED
 from dotenv import load_dotenv       # ✅ REQUIRED
 from openai import OpenAI            # ✅ REQUIRED
-
-# PDF generation (install: pip install reportlab)
-from reportlab.lib.pagesizes import LETTER
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
+from openai import (
+    AsyncOpenAI, APIConnectionError, APIError, InternalServerError, RateLimitError
 )
 
 try:
-    import streamlit
-    import openai
-    from reportlab.lib.pagesizes import LETTER
-    from reportlab.lib.units import inch
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
-except ImportError as e:
-    raise SystemExit(
-        "\n❌ Missing dependency.\n"
-        "Run:\n"
-        "  pip install -r requirements.txt\n\n"
-        f"Details: {e}\n"
-    )
+    import httpx                     # the openai SDK's HTTP client...
+except ImportError:
+    import httpx2 as httpx           # ...renamed in newer SDK releases
 
 # -------------------------
 # ENV & CLIENT
 # -------------------------
-load_dotenv()  # reads .env if present
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+@st.cache_resource
+def get_openai_client() -> OpenAI:
+    load_dotenv()  # reads .env if present
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+@st.cache_resource
+def get_stored_prompt_id():
+    """
+    Optional OPENAI_PROMPT_ID: a stored prompt (created in the OpenAI dashboard)
+    holding SYSTEM_PROMPT, so the system block is not re-uploaded on every call.
+    """
+    load_dotenv()
+    return os.getenv("OPENAI_PROMPT_ID") or None
 
 # -------------------------
 # STREAMLIT CONFIG
@@ -53,6 +65,8 @@ st.set_page_config(
     layout="centered",
 )
 
+MIN_DAYS, MAX_DAYS = 1, 30
+
 FORM_KEYS = [
     "destination",
     "num_days",
@@ -75,6 +89,10 @@ def reset_all_callback():
     st.session_state["plan_md"] = ""
     st.session_state.pop("last_model_used", None)
     st.session_state.pop("last_usage", None)
+    st.session_state.pop("last_input_hash", None)
+    st.session_state.pop("plan_days", None)
+    st.session_state.pop("plan_generated_at", None)
+    st.session_state.pop("plan_complete", None)
 
 def clear_fields_only_callback():
     st.session_state["destination"] = ""
@@ -124,160 +142,536 @@ Output rules:
 If destination is ambiguous, assume the most common city/country match and note the assumption in Trip Overview.
 """).strip()
 
+# OpenAI caches identical prompt prefixes automatically; keep the system message
+# first and byte-stable, and route all calls to the same cache with a fixed key.
+PROMPT_CACHE_KEY = hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:16]
+
+_USER_TMPL = dedent("""
+TRIP INPUTS
+- Destination: {destination}
+- Number of days: {num_days}
+- Special interests: {interests}
+- Guardrails / constraints: {guardrails}
+
+INSTRUCTIONS
+- Generate a complete plan for {num_days} days (Day 1..Day {num_days}).
+- Balance interests across days; do not repeat the exact same type of activity back-to-back unless necessary.
+- Use bullet points for activities with short labels and 1-line details.
+- Include suggested "time windows" (e.g., 9–12) optionally, but keep it readable.
+- If guardrails conflict with interests, prioritize guardrails and explain briefly in Practical Notes.
+""").strip()
+
 def build_user_prompt(destination: str, num_days: int, interests: str, guardrails: str) -> str:
-    return dedent(f"""
-    TRIP INPUTS
-    - Destination: {destination or 'N/A'}
-    - Number of days: {num_days}
-    - Special interests: {interests or 'None'}
-    - Guardrails / constraints: {guardrails or 'None'}
-
-    INSTRUCTIONS
-    - Generate a complete plan for {num_days} days (Day 1..Day {num_days}).
-    - Balance interests across days; do not repeat the exact same type of activity back-to-back unless necessary.
-    - Use bullet points for activities with short labels and 1-line details.
-    - Include suggested "time windows" (e.g., 9–12) optionally, but keep it readable.
-    - If guardrails conflict with interests, prioritize guardrails and explain briefly in Practical Notes.
-    """).strip()
+    return _USER_TMPL.format_map({
+        "destination": destination or "N/A",
+        "num_days": num_days,
+        "interests": interests or "None",
+        "guardrails": guardrails or "None",
+    })
 
 # -------------------------
-# FALLBACKS & EXTRACTOR
+# FALLBACKS
 # -------------------------
-FALLBACK_MODELS = ["gpt-5", "gpt-5-mini", "gpt-4.1"]  # try in order
+FALLBACK_MODELS = ["gpt-5", "gpt-5-mini", "gpt-4.1"]  # raced; ties go to earlier entries
 
-def _extract_text_from_chat_completion(comp) -> str:
+# -------------------------
+# MODEL RACE
+# -------------------------
+PLAN_TIMEOUT_S = 60      # per attempt
+PLAN_MAX_ATTEMPTS = 3    # per model, transient errors only
+_TRANSIENT_ERRORS = (
+    asyncio.TimeoutError, APIConnectionError, RateLimitError, InternalServerError,
+)
+# What a winner's stream can raise after its first delta: failed/error events
+# from _iter_deltas, API errors, or a dropped connection
+_STREAM_ERRORS = (RuntimeError, APIError, httpx.TransportError)
+
+async def _iter_deltas(stream, meta: dict):
     """
-    Defensive extractor for minor SDK/shape changes.
+    Yield output text deltas from a streamed Responses API call.
+    Usage and the final status ('completed' / 'incomplete', e.g. cut off by
+    max_output_tokens) arrive with the last event and are recorded into meta.
     """
-    try:
-        txt = comp.choices[0].message.content
-        if isinstance(txt, str) and txt.strip():
-            return txt
-        if isinstance(txt, list):
-            parts = []
-            for p in txt:
-                if isinstance(p, str):
-                    parts.append(p)
-                elif isinstance(p, dict) and isinstance(p.get("text"), str):
-                    parts.append(p["text"])
-            joined = "\n".join(parts).strip()
-            if joined:
-                return joined
-    except Exception:
-        pass
-    return ""
-
-def get_plan_markdown(user_prompt: str) -> str:
+    async with stream:  # closes the HTTP response even if abandoned mid-way
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+            elif event.type in ("response.completed", "response.incomplete"):
+                meta["status"] = event.response.status
+                usage = event.response.usage
+                meta["usage"] = usage.model_dump() if usage else None
+            elif event.type == "response.failed":
+                error = event.response.error
+                detail = error.message if error else "unknown error"
+                raise RuntimeError(f"Model '{meta['model']}' failed: {detail}")
+            elif event.type == "error":
+                raise RuntimeError(f"Model '{meta['model']}' failed: {event.message}")
+
+async def _first_text(aclient: AsyncOpenAI, model_name: str, request: dict):
     """
-    Robust call with model fallbacks and modern parameters.
-    - Uses max_completion_tokens (not max_tokens)
+    Open a stream and wait for its first non-empty text.
+    - Uses max_output_tokens (Responses API)
     - Omits temperature/top_p for GPT-5/4.1 variants
+    Returns (remaining_deltas, first_text, meta).
     """
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_prompt},
-    ]
-
-    last_error = None
-    for model_name in FALLBACK_MODELS:
+    stream = await aclient.responses.create(
+        model=model_name,
+        max_output_tokens=2200,
+        stream=True,
+        store=False,
+        prompt_cache_key=PROMPT_CACHE_KEY,
+        **request,
+    )
+    meta = {"model": model_name, "usage": None, "status": None}
+    deltas = _iter_deltas(stream, meta)
+    async for text in deltas:
+        if text:
+            return deltas, text, meta
+    raise RuntimeError(f"Model '{model_name}' returned empty content.")
+
+async def _attempt_model(aclient: AsyncOpenAI, model_name: str, request: dict):
+    """
+    One model: per-attempt timeout to first token, short backoff on transient errors.
+    """
+    for attempt in range(1, PLAN_MAX_ATTEMPTS + 1):
         try:
-            comp = client.chat.completions.create(
-                model=model_name,
-                messages=messages,
-                max_completion_tokens=2200,
+            return await asyncio.wait_for(
+                _first_text(aclient, model_name, request),
+                timeout=PLAN_TIMEOUT_S,
             )
-            text = _extract_text_from_chat_completion(comp)
-            if text.strip():
-                st.session_state["last_model_used"] = model_name
-                st.session_state["last_usage"] = getattr(comp, "usage", None)
-                return text
-            last_error = RuntimeError(f"Model '{model_name}' returned empty content.")
-        except Exception as e:
-            last_error = e
-            continue
+        except _TRANSIENT_ERRORS:
+            if attempt == PLAN_MAX_ATTEMPTS:
+                raise
+            await asyncio.sleep(2 ** (attempt - 1))
+
+async def _first_to_answer(aclient: AsyncOpenAI, models: list, request: dict):
+    """
+    Stream from all models concurrently; the first to produce text wins and the
+    rest are cancelled or closed. Ties go to the model listed first.
+    Returns (winner_or_None, last_error, failed_models).
+    """
+    task_models = {asyncio.create_task(_attempt_model(aclient, m, request)): m for m in models}
+    tasks = list(task_models)
+    winner = None
+    last_error = None
+    failed = []
+    try:
+        while tasks and winner is None:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in [t for t in tasks if t in done]:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    failed.append(task_models[task])
+                elif winner is None:
+                    winner = task.result()
+                else:
+                    await task.result()[0].aclose()  # simultaneous runner-up
+            tasks = [t for t in tasks if t not in done]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return winner, last_error, failed
+
+async def _race_models(user_prompt: str, models: tuple, on_delta, on_reset):
+    """
+    Race the fallback models and stream the winner's deltas to on_delta.
+    Returns ((text, model_used, usage), complete); complete is False for a
+    truncated response.
+    If the winner fails mid-stream, on_reset() is called to discard its partial
+    text and the race is rerun without it and without models that already failed.
+    """
+    # Fresh async client per race: its connection pool is bound to this event loop
+    api_key = get_openai_client().api_key
+
+    # System prompt is the shared, cacheable prefix; a stored prompt avoids resending it
+    prompt_id = get_stored_prompt_id()
+    request = {"input": user_prompt}
+    if prompt_id:
+        request["prompt"] = {"id": prompt_id}
+    else:
+        request["instructions"] = SYSTEM_PROMPT
+
+    async with AsyncOpenAI(api_key=api_key, max_retries=0, timeout=PLAN_TIMEOUT_S) as aclient:
+        remaining = list(models)
+        last_error = None
+        while remaining:
+            winner, last_error, failed = await _first_to_answer(aclient, remaining, request)
+            if winner is None:
+                break
+            remaining = [m for m in remaining if m not in failed]
+
+            deltas, first, meta = winner
+            parts = [first]
+            on_delta(first)
+            stream_error = None
+            while True:
+                # Only the stream read is guarded: on_delta errors are not model failures
+                try:
+                    text = await deltas.__anext__()
+                except StopAsyncIteration:
+                    break
+                except _STREAM_ERRORS as e:
+                    stream_error = e
+                    break
+                if text:
+                    parts.append(text)
+                    on_delta(text)
+
+            if stream_error is not None:
+                last_error = stream_error
+                remaining.remove(meta["model"])
+                on_reset()
+                continue
+
+            result = ("".join(parts), meta["model"], meta["usage"])
+            return result, meta["status"] == "completed"
 
     raise RuntimeError(f"All model attempts failed. Last error: {last_error}")
 
+# -------------------------
+# RESPONSE CACHE
+# -------------------------
+CACHE_DIR = Path(".cache")
+PLAN_CACHE_TTL = 24 * 60 * 60  # seconds
+
+def _plan_cache_path(user_prompt: str, models: tuple) -> Path:
+    """
+    Content-addressed cache file: same prompts + model order -> same file.
+    """
+    key = hashlib.sha256(
+        json.dumps([SYSTEM_PROMPT, get_stored_prompt_id(), user_prompt, list(models)]).encode()
+    ).hexdigest()
+    return CACHE_DIR / f"plan_{key}.json.zst"
+
+PLAN_CACHE_ZSTD_LEVEL = 3
+
+# Cache files are orjson payloads compressed with zstd. (De)compressor objects
+# are created per call: they are not safe to share across Streamlit's session threads.
+def _read_plan_cache(path: Path):
+    """
+    Returns ((text, model_used, usage), stored_at) for a fresh entry, else None.
+    """
+    try:
+        raw = zstd.ZstdDecompressor().decompress(path.read_bytes())
+        data = orjson.loads(raw)
+        if time.time() - data["ts"] > PLAN_CACHE_TTL:
+            return None
+        return (data["text"], data["model"], data.get("usage")), data["ts"]
+    except (OSError, ValueError, KeyError, TypeError, zstd.ZstdError):
+        return None
+
+def _write_plan_cache(path: Path, text: str, model_used: str, usage) -> None:
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        payload = {"text": text, "model": model_used, "usage": usage, "ts": time.time()}
+        cctx = zstd.ZstdCompressor(level=PLAN_CACHE_ZSTD_LEVEL)
+        path.write_bytes(cctx.compress(orjson.dumps(payload)))
+    except (OSError, TypeError):
+        pass  # cache is best-effort; never block the plan on disk errors
+
+PLAN_MEMO_MAX_ENTRIES = 128
+
+@st.cache_resource
+def _plan_memo() -> SimpleNamespace:
+    """
+    Process-wide in-memory LRU in front of the disk cache: path -> (stored_at, result).
+    Shared by all session threads, hence the lock.
+    """
+    return SimpleNamespace(lock=threading.Lock(), entries=OrderedDict())
+
+def _memo_put(path: Path, result, stored_at: float = None) -> None:
+    """
+    stored_at is when the result was produced (a disk entry's ts), so entries
+    promoted from disk expire on the same schedule as the file.
+    """
+    memo = _plan_memo()
+    now = time.time()
+    with memo.lock:
+        memo.entries[path] = (now if stored_at is None else stored_at, result)
+        memo.entries.move_to_end(path)
+        expired = [k for k, (stored_at, _) in memo.entries.items() if now - stored_at > PLAN_CACHE_TTL]
+        for key in expired:
+            del memo.entries[key]
+        while len(memo.entries) > PLAN_MEMO_MAX_ENTRIES:
+            memo.entries.popitem(last=False)  # least recently used
+
+def _lookup_plan(path: Path):
+    memo = _plan_memo()
+    with memo.lock:
+        hit = memo.entries.get(path)
+        if hit and time.time() - hit[0] <= PLAN_CACHE_TTL:
+            memo.entries.move_to_end(path)
+            return hit[1]
+        memo.entries.pop(path, None)
+    hit = _read_plan_cache(path)
+    if hit is None:
+        return None
+    result, stored_at = hit
+    _memo_put(path, result, stored_at=stored_at)
+    return result
+
+def _store_plan(path: Path, result) -> None:
+    _memo_put(path, result)
+    _write_plan_cache(path, *result)
+
+def get_plan_markdown(user_prompt: str, force: bool = False, on_delta=None, on_reset=None) -> str:
+    """
+    Cached plan generation: identical inputs return instantly (memory, then disk).
+    On a miss the winning model's output is streamed to on_delta(text) as it arrives;
+    on_reset() is called if that partial output is discarded for another model.
+    Pass force=True to skip both cache layers and call the models again.
+    Sets st.session_state["plan_complete"] to False if the plan was cut off.
+    """
+    models = tuple(FALLBACK_MODELS)
+    path = _plan_cache_path(user_prompt, models)
+    result = None if force else _lookup_plan(path)
+    complete = True  # only complete plans are ever cached
+    if result is None:
+        result, complete = asyncio.run(
+            _race_models(
+                user_prompt,
+                models,
+                on_delta or (lambda _text: None),
+                on_reset or (lambda: None),
+            )
+        )
+        if complete:  # never replay a truncated plan from the caches
+            _store_plan(path, result)
+
+    text, model_used, usage = result
+    st.session_state["last_model_used"] = model_used
+    st.session_state["last_usage"] = usage
+    st.session_state["plan_complete"] = complete
+    return text
+
+STREAM_RENDER_EVERY = 20  # chunks between re-renders while streaming
+
+def make_stream_renderer(placeholder):
+    """
+    (on_delta, on_reset) callbacks: on_delta redraws the placeholder on every Nth
+    chunk or newline instead of re-parsing the whole markdown on every token;
+    on_reset clears it when a model's partial output is abandoned.
+    """
+    buf = []
+
+    def on_delta(text: str) -> None:
+        buf.append(text)
+        if "\n" in text or len(buf) % STREAM_RENDER_EVERY == 0:
+            placeholder.markdown("".join(buf))
+
+    def on_reset() -> None:
+        buf.clear()
+        placeholder.empty()
+
+    return on_delta, on_reset
+
 # -------------------------
 # PDF HELPERS
 # -------------------------
-def markdown_to_flowables(md_text: str, styles):
+@functools.lru_cache(maxsize=None)
+def _reportlab() -> SimpleNamespace:
+    """
+    Import reportlab on first PDF export, not on every session start.
+    """
+    try:
+        from reportlab.lib.pagesizes import LETTER
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.utils import simpleSplit
+        from reportlab.pdfgen import canvas
+        from reportlab.platypus import (
+            SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
+        )
+    except ImportError as e:
+        raise RuntimeError(
+            "reportlab is required for PDF export (pip install reportlab). "
+            f"Details: {e}"
+        ) from e
+    return SimpleNamespace(
+        LETTER=LETTER,
+        getSampleStyleSheet=getSampleStyleSheet,
+        ParagraphStyle=ParagraphStyle,
+        SimpleDocTemplate=SimpleDocTemplate,
+        Paragraph=Paragraph,
+        Spacer=Spacer,
+        ListFlowable=ListFlowable,
+        ListItem=ListItem,
+        canvas=canvas,
+        simpleSplit=simpleSplit,
+    )
+
+@st.cache_resource
+def get_pdf_styles() -> dict:
+    """
+    Build the reportlab stylesheet once per process instead of per export.
+    """
+    rl = _reportlab()
+    styles = rl.getSampleStyleSheet()
+    return {
+        "body": styles["BodyText"],
+        "normal": styles["Normal"],
+        "h2": rl.ParagraphStyle("H2", parent=styles["Heading2"], spaceBefore=12, spaceAfter=6),
+        "h3": rl.ParagraphStyle("H3", parent=styles["Heading3"], spaceBefore=8, spaceAfter=4),
+        "header": rl.ParagraphStyle("Header", parent=styles["Title"], fontSize=18, spaceAfter=12),
+    }
+
+# One match per line classifies it: the named group that matched is the token kind
+_LINE_PREFIX = re.compile(r"(?P<h2>##\s+)|(?P<h3>###\s+)|(?P<bullet>\s*[-*•]\s*)")
+
+@functools.lru_cache(maxsize=256)
+def _parsed_para(text: str, style_id: str):
+    return _reportlab().Paragraph(text, get_pdf_styles()[style_id])
+
+def _para(text: str, style_id: str):
+    """
+    Plans repeat a lot of short lines (Morning / Afternoon / Evening ...):
+    parse each (text, style) once, hand out shallow copies because layout
+    mutates a Paragraph and one instance cannot appear twice in a story.
+    """
+    return copy.copy(_parsed_para(text, style_id))
+
+def _tokenize(md_text: str):
+    """
+    Classify each line once; yields (kind, text) with kind in
+    'blank', 'h2', 'h3', 'bullet', 'p'.
+    """
+    for line in md_text.splitlines():
+        line = line.rstrip()
+        if not line:
+            yield "blank", ""
+            continue
+        m = _LINE_PREFIX.match(line)
+        if m:
+            yield m.lastgroup, line[m.end():]
+        else:
+            yield "p", line  # includes '####' and '#hashtag' lines
+
+def _bullet_list(texts: list) -> list:
+    rl = _reportlab()
+    items = [rl.ListItem(_para(t, "body"), leftIndent=12) for t in texts]
+    return [rl.ListFlowable(items, bulletType="bullet", start="•", leftIndent=6), rl.Spacer(1, 4)]
+
+# Token kind -> builder for a run of consecutive tokens of that kind
+_BLOCK_BUILDERS = {
+    "blank": lambda texts: [_reportlab().Spacer(1, 6) for _ in texts],
+    "h2": lambda texts: [_para(t, "h2") for t in texts],
+    "h3": lambda texts: [_para(t, "h3") for t in texts],
+    "p": lambda texts: [_para(t, "body") for t in texts],
+    "bullet": _bullet_list,
+}
+
+def markdown_to_flowables(md_text: str):
     """
     Lightweight Markdown -> ReportLab flowables:
     - '## ' -> Heading2
     - '### ' -> Heading3
     - Bullets '-', '*', '•' -> unordered lists
     - Otherwise -> paragraph
+    Single pass: runs of same-kind tokens are built as one section and extended in.
     """
     flow = []
-    body = styles["BodyText"]
-    h2 = ParagraphStyle("H2", parent=styles["Heading2"], spaceBefore=12, spaceAfter=6)
-    h3 = ParagraphStyle("H3", parent=styles["Heading3"], spaceBefore=8, spaceAfter=4)
-
-    lines = md_text.splitlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i].rstrip()
-
-        if not line.strip():
-            flow.append(Spacer(1, 6))
-            i += 1
-            continue
+    for kind, run in groupby(_tokenize(md_text), key=itemgetter(0)):
+        flow.extend(_BLOCK_BUILDERS[kind]([text for _, text in run]))
+    return flow
 
-        if line.startswith("## "):
-            flow.append(Paragraph(line[3:].strip(), h2))
-            i += 1
-            continue
-        if line.startswith("### "):
-            flow.append(Paragraph(line[4:].strip(), h3))
-            i += 1
-            continue
+PDF_MARGIN_X = 0.5 * 72  # points (72 per inch)
+PDF_MARGIN_Y = 0.7 * 72
+FAST_PDF_MAX_DAYS = 2     # short trips usually fit on one page
+
+# Single-page fast path: token kind -> (font, size, leading, indent, space_before)
+_FAST_PDF_STYLES = {
+    "h2": ("Helvetica-Bold", 14, 17, 0, 12),
+    "h3": ("Helvetica-Bold", 12, 14, 0, 8),
+    "bullet": ("Helvetica", 10, 12, 18, 0),
+    "p": ("Helvetica", 10, 12, 0, 0),
+}
 
-        if line.lstrip().startswith(("-", "*", "•")):
-            items = []
-            while i < len(lines) and lines[i].lstrip().startswith(("-", "*", "•")):
-                bullet_text = lines[i].lstrip()[1:].strip()
-                items.append(ListItem(Paragraph(bullet_text, body), leftIndent=12))
-                i += 1
-            flow.append(ListFlowable(items, bulletType="bullet", start="•", leftIndent=6))
-            flow.append(Spacer(1, 4))
+def _write_single_page(buf, markdown_text: str, meta: str) -> bool:
+    """
+    Draw the plan straight onto one canvas page, skipping Platypus frames and
+    page breaks. Returns False (nothing written) if the plan needs more than a page.
+    """
+    rl = _reportlab()
+    page_w, page_h = rl.LETTER
+    width = page_w - 2 * PDF_MARGIN_X
+    top = page_h - PDF_MARGIN_Y
+
+    title_y = top - 18
+    meta_y = title_y - 26
+    # Lay out first: (baseline_y, font, size, x, text)
+    lines = []
+    y = meta_y - 10
+    for kind, text in _tokenize(markdown_text):
+        if kind == "blank":
+            y -= 6
             continue
+        font, size, leading, indent, space_before = _FAST_PDF_STYLES[kind]
+        y -= space_before
+        x = PDF_MARGIN_X + indent
+        for i, chunk in enumerate(rl.simpleSplit(text, font, size, width - indent) or [""]):
+            y -= leading
+            if y < PDF_MARGIN_Y:
+                return False
+            if kind == "bullet" and i == 0:
+                lines.append((y, font, size, x - 10, "•"))
+            lines.append((y, font, size, x, chunk))
+
+    c = rl.canvas.Canvas(buf, pagesize=rl.LETTER)
+    c.setTitle("Travel Plan")
+    c.setAuthor("Travel Guide")
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(page_w / 2, title_y, "Travel Plan")
+    c.setFont("Helvetica", 10)
+    c.drawString(PDF_MARGIN_X, meta_y, meta)
+    for y, font, size, x, text in lines:
+        c.setFont(font, size)
+        c.drawString(x, y, text)
+    c.showPage()
+    c.save()
+    return True
+
+def write_pdf(markdown_text: str, num_days: int = None, generated_at: str = None) -> bytes:
+    """
+    Render the plan to an in-memory PDF and return its bytes (nothing touches disk).
+    Plans of up to FAST_PDF_MAX_DAYS days that fit on one page skip Platypus.
+    """
+    rl = _reportlab()
+    buf = io.BytesIO()
+    meta = f"Generated: {generated_at or datetime.now().strftime('%Y-%m-%d %H:%M')}"
 
-        flow.append(Paragraph(line, body))
-        i += 1
+    if num_days is not None and num_days <= FAST_PDF_MAX_DAYS:
+        if _write_single_page(buf, markdown_text, meta):
+            return buf.getvalue()
 
-    return flow
-
-def write_pdf(markdown_text: str, filename: str = "travel_plan.pdf") -> str:
     # Letter with 0.5" left/right margins (and ~0.7" top/bottom)
-    doc = SimpleDocTemplate(
-        filename,
-        pagesize=LETTER,
-        leftMargin=0.5 * inch,
-        rightMargin=0.5 * inch,
-        topMargin=0.7 * inch,
-        bottomMargin=0.7 * inch,
+    doc = rl.SimpleDocTemplate(
+        buf,
+        pagesize=rl.LETTER,
+        leftMargin=PDF_MARGIN_X,
+        rightMargin=PDF_MARGIN_X,
+        topMargin=PDF_MARGIN_Y,
+        bottomMargin=PDF_MARGIN_Y,
         title="Travel Plan",
         author="Travel Guide",
     )
-    styles = getSampleStyleSheet()
-
-    header = ParagraphStyle(
-        "Header",
-        parent=styles["Title"],
-        fontSize=18,
-        spaceAfter=12,
-    )
+    styles = get_pdf_styles()
 
     story = []
-    story.append(Paragraph("Travel Plan", header))
-    meta = f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    story.append(Paragraph(meta, styles["Normal"]))
-    story.append(Spacer(1, 10))
+    story.append(_para("Travel Plan", "header"))
+    story.append(rl.Paragraph(meta, styles["normal"]))
+    story.append(rl.Spacer(1, 10))
 
-    story.extend(markdown_to_flowables(markdown_text, styles))
+    story.extend(markdown_to_flowables(markdown_text))
     doc.build(story)
-    return filename
+    return buf.getvalue()
+
+@st.cache_data(ttl=60 * 60, max_entries=64, show_spinner=False)
+def build_pdf_bytes(plan_md: str, num_days: int = None, generated_at: str = None) -> bytes:
+    """
+    PDF is a pure function of its arguments: render once in memory, reuse on reruns.
+    generated_at is part of the key so a cached PDF never shows a stale timestamp.
+    """
+    return write_pdf(plan_md, num_days=num_days, generated_at=generated_at)
 
 # -------------------------
 # INPUT FORM
@@ -291,11 +685,11 @@ with st.form("travel_inputs"):
 
     st.number_input(
         "2) Number of Days",
-        min_value=1,
-        max_value=30,
+        min_value=MIN_DAYS,
+        max_value=MAX_DAYS,
         step=1,
         key="num_days",
-        help="Keep it between 1 and 30 for best results.",
+        help=f"Keep it between {MIN_DAYS} and {MAX_DAYS} for best results.",
     )
 
     st.text_area(
@@ -312,82 +706,167 @@ with st.form("travel_inputs"):
     )
 
     submitted = st.form_submit_button("Generate Travel Plan")
+    regenerate = st.form_submit_button(
+        "🔄 Regenerate (skip cache)",
+        help="Ignore any cached plan for these inputs and call the model again.",
+    )
 
 # -------------------------
 # QUICK API SELF-TEST
 # -------------------------
+SELFTEST_TTL = 5 * 60  # seconds
+SELFTEST_PATH = CACHE_DIR / "selftest.json"
+
+@st.cache_data(ttl=SELFTEST_TTL, show_spinner=False)
+def _selftest(model: str, _force: bool = False) -> dict:
+    """
+    Tiny billed ping, reused for SELFTEST_TTL (memory, then .cache/selftest.json).
+    Failures raise and are never cached.
+    """
+    if not _force:
+        try:
+            last = json.loads(SELFTEST_PATH.read_text(encoding="utf-8"))
+            if last["model"] == model and time.time() - last["ts"] <= SELFTEST_TTL:
+                return last
+        except (OSError, ValueError, KeyError):
+            pass
+
+    ping = get_openai_client().responses.create(
+        model=model,
+        input="Reply with the single word: READY",
+        max_output_tokens=16,  # API minimum
+        store=False,
+    )
+    if ping.status != "completed" or not ping.output_text.strip():
+        # e.g. reasoning tokens used up the budget: a failed ping, not a cached success
+        raise RuntimeError(f"Model '{model}' returned no text (status: {ping.status}).")
+    result = {"model": model, "text": ping.output_text, "ts": time.time()}
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        SELFTEST_PATH.write_text(json.dumps(result), encoding="utf-8")
+    except OSError:
+        pass
+    return result
+
 with st.expander("Diagnostics (optional)", expanded=False):
+    force_refresh = st.checkbox(
+        "Force refresh",
+        help=f"Results are reused for {SELFTEST_TTL // 60} minutes; tick to call the API again.",
+    )
     if st.button("Run quick API self-test"):
+        if force_refresh:
+            _selftest.clear()
         try:
-            ping = client.chat.completions.create(
-                model=FALLBACK_MODELS[0],
-                messages=[{"role": "user", "content": "Reply with the single word: READY"}],
-                max_completion_tokens=10,
-            )
-            st.success("Self-test response:")
-            st.code(_extract_text_from_chat_completion(ping))
+            result = _selftest(FALLBACK_MODELS[0], _force=force_refresh)
+            age = int(time.time() - result["ts"])
+            st.success("Self-test response:" + (f" (cached {age}s ago)" if age else ""))
+            st.code(result["text"])
         except Exception as e:
             st.error(f"Self-test failed: {e}")
 
 # -------------------------
 # MAIN ACTION
 # -------------------------
-if submitted:
+def render_plan_text(plan_md: str) -> None:
+    st.markdown(plan_md, unsafe_allow_html=False)
+    # Raw copy is only sent to the browser when asked for (not on every rerun)
+    if st.toggle("Show raw text (copy-friendly)", value=False, key="show_raw"):
+        st.text_area("Plan (raw)", plan_md, height=420)
+
+generated = False  # a model call (or plan cache lookup) actually ran on this rerun
+if submitted or regenerate:
     destination = (st.session_state["destination"] or "").strip()
     num_days = int(st.session_state["num_days"] or 0)
 
     if not destination:
         st.warning("Please provide a **Destination**.")
-    elif num_days < 1:
-        st.warning("Please provide a valid **Number of Days**.")
+    elif not MIN_DAYS <= num_days <= MAX_DAYS:
+        st.warning(f"Please provide a valid **Number of Days** ({MIN_DAYS}-{MAX_DAYS}).")
     else:
-        with st.spinner("Generating your travel plan..."):
-            user_prompt = build_user_prompt(
-                destination=destination,
-                num_days=num_days,
-                interests=st.session_state["interests"],
-                guardrails=st.session_state["guardrails"],
-            )
-            try:
-                st.session_state["plan_md"] = get_plan_markdown(user_prompt)
-            except Exception as e:
-                st.error(f"Generation error: {e}")
-                st.session_state["plan_md"] = ""
-
-    if st.session_state["plan_md"].strip():
+        interests = st.session_state["interests"]
+        guardrails = st.session_state["guardrails"]
+        input_hash = hashlib.blake2b(
+            f"{destination}|{num_days}|{interests}|{guardrails}".encode(), digest_size=16
+        ).hexdigest()
+
+        if (
+            not regenerate
+            and input_hash == st.session_state.get("last_input_hash")
+            and st.session_state["plan_md"]
+            and st.session_state.get("plan_complete", False)
+        ):
+            st.info("Inputs unchanged, showing the current plan. Use **Regenerate** for a new one.")
+        else:
+            generated = True
+            stream_area = st.empty()
+            on_delta, on_reset = make_stream_renderer(stream_area)
+            with st.spinner("Generating your travel plan..."):
+                user_prompt = build_user_prompt(
+                    destination=destination,
+                    num_days=num_days,
+                    interests=interests,
+                    guardrails=guardrails,
+                )
+                try:
+                    st.session_state["plan_md"] = get_plan_markdown(
+                        user_prompt,
+                        force=regenerate,
+                        on_delta=on_delta,
+                        on_reset=on_reset,
+                    )
+                    if st.session_state["plan_complete"]:
+                        st.session_state["last_input_hash"] = input_hash
+                    else:
+                        st.session_state.pop("last_input_hash", None)  # let Generate retry
+                    st.session_state["plan_days"] = num_days
+                    st.session_state["plan_generated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M")
+                except Exception as e:
+                    st.error(f"Generation error: {e}")
+                    st.session_state["plan_md"] = ""
+                    st.session_state.pop("last_input_hash", None)
+                    st.session_state.pop("plan_complete", None)
+            stream_area.empty()  # full plan is rendered below
+
+# The plan view is keyed on the stored plan, not on `submitted`, so it survives
+# reruns triggered by widgets inside it (e.g. the raw-text toggle).
+if st.session_state["plan_md"].strip():
+    plan_complete = st.session_state.get("plan_complete", True)
+    if generated and plan_complete:
         st.success("Travel plan generated!")
+    if not plan_complete:
+        st.warning(
+            "This plan was cut off before the end (response length limit). "
+            "Click **Regenerate** to try for a complete plan."
+        )
+    if generated:
         st.caption(f"Model: {st.session_state.get('last_model_used', 'unknown')}")
         if st.session_state.get("last_usage"):
             st.caption(f"Usage: {st.session_state['last_usage']}")
 
-        st.subheader("Your Travel Plan")
-        st.markdown(st.session_state["plan_md"], unsafe_allow_html=False)
-
-        with st.expander("Show raw text (copy-friendly)"):
-            st.text_area("Plan (raw)", st.session_state["plan_md"], height=420)
+    st.subheader("Your Travel Plan")
+    render_plan_text(st.session_state["plan_md"])
 
-        # PDF export
-        try:
-            pdf_path = write_pdf(st.session_state["plan_md"], filename="travel_plan.pdf")
-            with open(pdf_path, "rb") as f:
-                st.download_button(
-                    label="⬇️ Download PDF",
-                    data=f.read(),
-                    file_name="travel_plan.pdf",
-                    mime="application/pdf",
-                )
-        except Exception as e:
-            st.error(f"PDF generation error: {e}")
-            st.info("You can still copy the plan above while we sort out PDF export.")
-    else:
-        st.warning("The model returned an empty response.")
-        st.info("Try again, or verify your API key/model access in Diagnostics above.")
-else:
-    if "plan_md" in st.session_state and st.session_state["plan_md"].strip():
-        st.subheader("Last Generated Plan")
-        st.markdown(st.session_state["plan_md"], unsafe_allow_html=False)
-    else:
-        st.info("Fill in the fields above and click **Generate Travel Plan**.")
+    # PDF export (on_click="ignore": downloading does not rerun the script)
+    try:
+        st.download_button(
+            label="⬇️ Download PDF",
+            data=build_pdf_bytes(
+                st.session_state["plan_md"],
+                st.session_state.get("plan_days"),
+                st.session_state.get("plan_generated_at"),
+            ),
+            file_name="travel_plan.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+        )
+    except Exception as e:
+        st.error(f"PDF generation error: {e}")
+        st.info("You can still copy the plan above while we sort out PDF export.")
+elif generated:
+    st.warning("The model returned an empty response.")
+    st.info("Try again, or verify your API key/model access in Diagnostics above.")
+elif not (submitted or regenerate):
+    st.info("Fill in the fields above and click **Generate Travel Plan**.")
 
 st.divider()
 col_a, col_b = st.columns([1, 1])